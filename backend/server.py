@@ -1,13 +1,18 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Header
 from fastapi.responses import JSONResponse
+from sse_starlette.sse import EventSourceResponse, ServerSentEvent
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure, PyMongoError
 import os
 import logging
+import asyncio
+import json
+from collections import deque
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import List, Optional, Set, Tuple
 import uuid
 from datetime import datetime, timezone
 import base64
@@ -74,6 +79,147 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+# ============== EVENTOS DE IMAGENS (SSE) ==============
+
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 3000
+# Um cliente travado bloqueia o send(); após esse tempo o stream é encerrado
+SSE_SEND_TIMEOUT_SECONDS = 5
+CHANGE_STREAM_RETRY_SECONDS = 5
+# Códigos do Mongo para "change streams não suportados" (standalone, versões antigas)
+CHANGE_STREAM_UNSUPPORTED_CODES = {40573, 40324}
+
+class ImageEventHub:
+    """Distribui eventos de novas imagens para os clientes SSE conectados.
+
+    Cada cliente tem uma fila pequena; quem não consome a tempo é desconectado
+    e retoma pelo histórico usando o Last-Event-ID.
+    """
+
+    def __init__(self, history_size: int = 256, queue_size: int = 32):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.change_stream_active = False
+        self._seq = 0
+        self._history = deque(maxlen=history_size)
+        self._queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def last_event_id(self) -> str:
+        return f"{self.epoch}:{self._seq}"
+
+    def publish(self, data: dict) -> None:
+        self._seq += 1
+        event = (f"{self.epoch}:{self._seq}", self._seq, json.dumps(data))
+        self._history.append(event)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._close(queue)
+                logger.info("Assinante SSE lento desconectado")
+
+    def reset(self) -> None:
+        """Começa uma nova época quando eventos podem ter se perdido.
+
+        Os streams abertos são encerrados; ao reconectar com um id da época
+        anterior, os clientes recebem reset e recarregam a galeria.
+        """
+        self.epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._history.clear()
+        for queue in list(self._subscribers):
+            self._close(queue)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Tuple[asyncio.Queue, Optional[list]]:
+        """Registra um assinante e retorna os eventos perdidos desde last_event_id.
+
+        O backlog é None quando não é possível retomar (servidor reiniciado ou
+        histórico já descartado) e o cliente precisa recarregar a galeria.
+        """
+        queue = asyncio.Queue(maxsize=self._queue_size)
+        self._subscribers.add(queue)
+        return queue, self._replay(last_event_id)
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def _close(self, queue: asyncio.Queue) -> None:
+        # Descarta a fila e sinaliza o encerramento do stream
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def _replay(self, last_event_id: Optional[str]) -> Optional[list]:
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition(":")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq > self._seq:
+            return None
+        if self._history and seq < self._history[0][1] - 1:
+            return None
+        return [event for event in self._history if event[1] > seq]
+
+image_events = ImageEventHub()
+change_stream_task: Optional[asyncio.Task] = None
+
+def image_event_payload(image_doc: dict) -> dict:
+    """Metadados enviados no evento (sem o base64 da imagem)"""
+    return {
+        "id": image_doc.get("id"),
+        "style": image_doc.get("style"),
+        "prompt": image_doc.get("prompt"),
+        "created_at": image_doc.get("created_at"),
+    }
+
+async def watch_product_images():
+    """Publica inserções em product_images a partir de um change stream do Mongo.
+
+    Se o Mongo não suportar change streams (ex.: instância standalone), encerra
+    e o endpoint de geração passa a publicar diretamente no hub. Depois que há
+    um resume_token, quedas temporárias não voltam ao broadcast direto: o
+    change stream retoma e publica as inserções do intervalo, sem duplicá-las.
+    Se o token não puder mais ser retomado (ex.: ChangeStreamHistoryLost), o
+    hub muda de época para que os clientes recarreguem a galeria.
+    """
+    pipeline = [
+        {"$match": {"operationType": "insert"}},
+        {"$project": {"fullDocument.image_base64": 0}},
+    ]
+    resume_token = None
+    try:
+        while True:
+            try:
+                async with db.product_images.watch(pipeline, resume_after=resume_token) as stream:
+                    image_events.change_stream_active = True
+                    logger.info("Change stream de product_images ativo")
+                    resume_token = stream.resume_token or resume_token
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        image_events.publish(image_event_payload(change["fullDocument"]))
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                    logger.info(f"Change streams indisponíveis, usando broadcast em processo: {str(e)}")
+                    return
+                if resume_token is not None:
+                    # Inserções do intervalo não podem ser recuperadas
+                    resume_token = None
+                    image_events.reset()
+                image_events.change_stream_active = False
+                logger.warning(f"Change stream falhou, reiniciando sem resume_token: {str(e)}")
+            except PyMongoError as e:
+                image_events.change_stream_active = resume_token is not None
+                logger.warning(f"Change stream interrompido, tentando novamente: {str(e)}")
+            await asyncio.sleep(CHANGE_STREAM_RETRY_SECONDS)
+    except Exception as e:
+        logger.error(f"Change stream encerrado, usando broadcast em processo: {str(e)}")
+    finally:
+        image_events.change_stream_active = False
+
 # ============== DADOS DO PRODUTO ==============
 
 PRODUCT_DATA = {
@@ -417,9 +563,12 @@ async def generate_product_image(request: ImageGenerationRequest):
                 "created_at": datetime.now(timezone.utc).isoformat()
             }
             await db.product_images.insert_one(image_doc)
+            if not image_events.change_stream_active:
+                image_events.publish(image_event_payload(image_doc))
             
             return {
                 "success": True,
+                "id": image_doc["id"],
                 "image_base64": image_base64,
                 "prompt_used": final_prompt
             }
@@ -436,6 +585,49 @@ async def get_generated_images():
     images = await db.product_images.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
     return {"images": images}
 
+@api_router.get("/images/events")
+async def stream_image_events(last_event_id: Optional[str] = Header(None)):
+    """Stream SSE com metadados de cada nova imagem gerada"""
+    current_id = image_events.last_event_id
+    queue, backlog = image_events.subscribe(last_event_id)
+    # O primeiro frame já leva um id: um cliente que cair antes de receber
+    # qualquer evento reconecta com Last-Event-ID e recupera o intervalo
+    opening_id = last_event_id if backlog else current_id
+
+    # EventSourceResponse encerra o stream quando o cliente desconecta ou o
+    # servidor recebe SIGTERM/reload, sem segurar o shutdown do uvicorn
+    async def event_stream():
+        try:
+            yield ServerSentEvent(id=opening_id, retry=SSE_RETRY_MS)
+            if backlog is None:
+                # Não dá para retomar: o cliente deve recarregar /api/images
+                yield ServerSentEvent("{}", event="reset", id=current_id)
+            else:
+                for event_id, _, data in backlog:
+                    yield ServerSentEvent(data, event="image", id=event_id)
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                event_id, _, data = event
+                yield ServerSentEvent(data, event="image", id=event_id)
+        finally:
+            image_events.unsubscribe(queue)
+
+    return EventSourceResponse(
+        event_stream(),
+        ping=SSE_KEEPALIVE_SECONDS,
+        send_timeout=SSE_SEND_TIMEOUT_SECONDS,
+    )
+
+@api_router.get("/images/{image_id}")
+async def get_generated_image(image_id: str):
+    """Retorna uma imagem gerada pelo id"""
+    image = await db.product_images.find_one({"id": image_id}, {"_id": 0})
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.model_dump()
@@ -464,6 +656,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_image_change_stream():
+    global change_stream_task
+    change_stream_task = asyncio.create_task(watch_product_images())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if change_stream_task:
+        change_stream_task.cancel()
     client.close()
@@ -107,6 +107,27 @@ class AquaFreshProAPITester:
         """Test get generated images endpoint"""
         return self.run_test("Get Generated Images", "GET", "images", 200)
 
+    def test_image_events_stream(self):
+        """Test SSE stream of new image events"""
+        url = f"{self.api_url}/images/events"
+        print(f"\n🔍 Testing Image Events Stream...")
+        print(f"   URL: {url}")
+
+        try:
+            with requests.get(url, stream=True, timeout=10) as response:
+                content_type = response.headers.get('Content-Type', '')
+                first_line = next(response.iter_lines(decode_unicode=True), '')
+            success = response.status_code == 200 and content_type.startswith('text/event-stream') and first_line.startswith('retry:')
+            self.log_test("Image Events Stream", success, f"Status: {response.status_code}, Content-Type: {content_type}, First line: {first_line}")
+            return success
+        except Exception as e:
+            self.log_test("Image Events Stream", False, f"Error: {str(e)}")
+            return False
+
+    def test_get_image_not_found(self):
+        """Test get single image with unknown id"""
+        return self.run_test("Get Image - Not Found", "GET", "images/does-not-exist", 404)
+
     def test_image_generation(self):
         """Test image generation endpoint - with long timeout"""
         print(f"\n⚠️  Image generation test - this may take up to 90 seconds...")
@@ -127,7 +148,7 @@ class AquaFreshProAPITester:
         
         if success:
             # Verify response has required fields
-            required_fields = ['success', 'image_base64', 'prompt_used']
+            required_fields = ['success', 'id', 'image_base64', 'prompt_used']
             missing_fields = [field for field in required_fields if field not in response]
             
             if missing_fields:
@@ -168,6 +189,8 @@ class AquaFreshProAPITester:
         self.test_buyer_personas()
         self.test_marketing_info()
         self.test_get_images()
+        self.test_image_events_stream()
+        self.test_get_image_not_found()
         self.test_status_endpoints()
         
         # Image generation test (potentially slow)
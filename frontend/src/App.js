@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import "@/App.css";
 import axios from "axios";
 
@@ -531,7 +531,7 @@ const GallerySection = ({ onGenerateImage, generatedImages, isGenerating }) => {
             <h3 className="text-xl font-bold text-white mb-4">Imagens Geradas</h3>
             <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-6">
               {generatedImages.map((img, index) => (
-                <div key={index} className="bg-slate-800 rounded-xl overflow-hidden border border-slate-700">
+                <div key={img.id || index} className="bg-slate-800 rounded-xl overflow-hidden border border-slate-700">
                   <img
                     src={`data:image/png;base64,${img.image_base64}`}
                     alt={`Produto gerado ${index + 1}`}
@@ -591,6 +591,46 @@ function App() {
   const [isGenerating, setIsGenerating] = useState(false);
   const [loading, setLoading] = useState(true);
 
+  // Ids já exibidos, para não baixar de novo o base64 de imagens conhecidas
+  const knownImageIds = useRef(new Set());
+  // Eventos recebidos enquanto esta aba gera uma imagem: a própria imagem
+  // chega pela resposta do POST, então só as demais são buscadas depois
+  const generationInFlight = useRef(false);
+  const deferredImageIds = useRef([]);
+
+  const fetchImages = useCallback(async () => {
+    try {
+      const response = await axios.get(`${API}/images`);
+      const images = response.data.images || [];
+      const fetchedIds = new Set(images.map(img => img.id));
+      fetchedIds.forEach(id => knownImageIds.current.add(id));
+      // Mescla com imagens que chegaram via SSE durante a requisição, que
+      // são mais novas que a lista retornada
+      setGeneratedImages(prev => [
+        ...prev.filter(img => !fetchedIds.has(img.id)),
+        ...images
+      ]);
+    } catch (error) {
+      console.error('Erro ao carregar imagens:', error);
+    }
+  }, []);
+
+  const addImage = useCallback((image) => {
+    if (knownImageIds.current.has(image.id)) return;
+    knownImageIds.current.add(image.id);
+    setGeneratedImages(prev => [image, ...prev]);
+  }, []);
+
+  const fetchImageById = useCallback(async (id) => {
+    if (knownImageIds.current.has(id)) return;
+    try {
+      const response = await axios.get(`${API}/images/${id}`);
+      addImage({ ...response.data, prompt_used: response.data.prompt });
+    } catch (error) {
+      console.error('Erro ao carregar nova imagem:', error);
+    }
+  }, [addImage]);
+
   useEffect(() => {
     const fetchProductData = async () => {
       try {
@@ -603,21 +643,32 @@ function App() {
       }
     };
 
-    const fetchImages = async () => {
-      try {
-        const response = await axios.get(`${API}/images`);
-        setGeneratedImages(response.data.images || []);
-      } catch (error) {
-        console.error('Erro ao carregar imagens:', error);
-      }
-    };
-
     fetchProductData();
     fetchImages();
-  }, []);
+  }, [fetchImages]);
+
+  // Novas imagens (inclusive geradas em outras abas) chegam via SSE
+  useEffect(() => {
+    const source = new EventSource(`${API}/images/events`);
+
+    source.addEventListener('image', (event) => {
+      const { id } = JSON.parse(event.data);
+      if (generationInFlight.current) {
+        deferredImageIds.current.push(id);
+      } else {
+        fetchImageById(id);
+      }
+    });
+
+    // O servidor não conseguiu retomar do Last-Event-ID: recarrega a galeria
+    source.addEventListener('reset', fetchImages);
+
+    return () => source.close();
+  }, [fetchImages, fetchImageById]);
 
   const handleGenerateImage = async (customPrompt, style) => {
     setIsGenerating(true);
+    generationInFlight.current = true;
     try {
       const response = await axios.post(`${API}/generate-image`, {
         prompt: customPrompt || '',
@@ -625,16 +676,19 @@ function App() {
       });
       
       if (response.data.success) {
-        setGeneratedImages(prev => [{
+        addImage({
+          id: response.data.id,
           image_base64: response.data.image_base64,
           prompt_used: response.data.prompt_used
-        }, ...prev]);
+        });
       }
     } catch (error) {
       console.error('Erro ao gerar imagem:', error);
       alert('Erro ao gerar imagem. Tente novamente.');
     } finally {
+      generationInFlight.current = false;
       setIsGenerating(false);
+      deferredImageIds.current.splice(0).forEach(fetchImageById);
     }
   };
 
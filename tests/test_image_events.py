@@ -0,0 +1,410 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'test_database')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import server  # noqa: E402
+from server import ImageEventHub, image_event_payload  # noqa: E402
+from pymongo.errors import AutoReconnect, OperationFailure  # noqa: E402
+import pytest  # noqa: E402
+from sse_starlette.sse import AppStatus, SendTimeoutError  # noqa: E402
+
+
+def events_scope(last_event_id=None):
+    headers = [(b"host", b"testserver")]
+    if last_event_id:
+        headers.append((b"last-event-id", last_event_id.encode()))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/images/events",
+        "raw_path": b"/api/images/events",
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+def read_sse(frames, last_event_id=None):
+    """Abre /api/images/events direto no app ASGI e lê `frames` frames SSE"""
+    async def run():
+        # O evento de shutdown do sse-starlette fica preso ao loop que o criou
+        AppStatus.should_exit_event = None
+        disconnected = asyncio.Event()
+        chunks = []
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                chunks.append(message["body"].decode())
+                if "".join(chunks).count("\r\n\r\n") >= frames:
+                    disconnected.set()
+
+        await asyncio.wait_for(server.app(events_scope(last_event_id), receive, send), timeout=5)
+        return "".join(chunks)
+
+    parsed = []
+    for frame in asyncio.run(run()).split("\r\n\r\n")[:frames]:
+        fields = {}
+        for line in frame.split("\r\n"):
+            name, _, value = line.partition(": ")
+            fields[name] = value
+        parsed.append(fields)
+    return parsed
+
+
+class FakeChangeStream:
+    def __init__(self, changes, error):
+        self._changes = changes
+        self._error = error
+        self.resume_token = None
+
+    async def __aenter__(self):
+        if self._error is not None and not self._changes:
+            raise self._error
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for change in self._changes:
+            self.resume_token = {"_data": change["fullDocument"]["id"]}
+            yield change
+        if self._error is not None:
+            raise self._error
+
+
+class FakeImagesCollection:
+    """Roteiro de change streams: cada watch() consome um (changes, erro)"""
+
+    def __init__(self, hub, *script):
+        self._hub = hub
+        self._script = list(script)
+        self.calls = []
+
+    def watch(self, pipeline, resume_after=None):
+        self.calls.append({"resume_after": resume_after, "active": self._hub.change_stream_active})
+        changes, error = self._script.pop(0)
+        return FakeChangeStream(changes, error)
+
+
+def insert(image_id):
+    return {"operationType": "insert", "fullDocument": {"id": image_id}}
+
+
+def run_watcher(monkeypatch, *script):
+    hub = ImageEventHub()
+    images = FakeImagesCollection(hub, *script)
+    monkeypatch.setattr(server, "image_events", hub)
+    monkeypatch.setattr(server, "db", SimpleNamespace(product_images=images))
+    monkeypatch.setattr(server, "CHANGE_STREAM_RETRY_SECONDS", 0)
+    asyncio.run(asyncio.wait_for(server.watch_product_images(), timeout=5))
+    return hub, images
+
+
+UNSUPPORTED = OperationFailure("not a replica set", code=40573)
+
+
+def drain(queue):
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+def test_publish_reaches_all_subscribers():
+    hub = ImageEventHub()
+    first, _ = hub.subscribe()
+    second, _ = hub.subscribe()
+
+    hub.publish({"id": "a"})
+
+    assert [event[0] for event in drain(first)] == [f"{hub.epoch}:1"]
+    assert [event[0] for event in drain(second)] == [f"{hub.epoch}:1"]
+
+
+def test_unsubscribe_stops_delivery():
+    hub = ImageEventHub()
+    queue, _ = hub.subscribe()
+    hub.unsubscribe(queue)
+
+    hub.publish({"id": "a"})
+
+    assert queue.empty()
+
+
+def test_slow_subscriber_is_dropped_with_sentinel():
+    hub = ImageEventHub(queue_size=2)
+    slow, _ = hub.subscribe()
+    fast, _ = hub.subscribe()
+
+    hub.publish({"id": "a"})
+    hub.publish({"id": "b"})
+    drain(fast)
+    hub.publish({"id": "c"})
+
+    # A fila cheia é descartada e só resta o sinal de encerramento
+    assert drain(slow) == [None]
+    assert [event[1] for event in drain(fast)] == [3]
+    hub.publish({"id": "d"})
+    assert slow.empty()
+
+
+def test_subscribe_without_last_event_id_has_empty_backlog():
+    hub = ImageEventHub()
+    hub.publish({"id": "a"})
+
+    _, backlog = hub.subscribe(None)
+
+    assert backlog == []
+
+
+def test_last_event_id_replays_missed_events():
+    hub = ImageEventHub()
+    for image_id in "abc":
+        hub.publish({"id": image_id})
+
+    _, backlog = hub.subscribe(f"{hub.epoch}:1")
+
+    assert [event[1] for event in backlog] == [2, 3]
+
+
+def test_last_event_id_at_current_seq_has_empty_backlog():
+    hub = ImageEventHub()
+    hub.publish({"id": "a"})
+
+    _, backlog = hub.subscribe(hub.last_event_id)
+
+    assert backlog == []
+
+
+def test_replay_boundary_at_start_of_history():
+    hub = ImageEventHub(history_size=3)
+    for image_id in "abcde":
+        hub.publish({"id": image_id})
+
+    # Histórico guarda 3..5: quem viu o 2 ainda retoma, quem viu o 1 não
+    _, backlog = hub.subscribe(f"{hub.epoch}:2")
+    assert [event[1] for event in backlog] == [3, 4, 5]
+
+    _, backlog = hub.subscribe(f"{hub.epoch}:1")
+    assert backlog is None
+
+
+def test_unknown_epoch_requires_reset():
+    hub = ImageEventHub()
+    hub.publish({"id": "a"})
+
+    _, backlog = hub.subscribe("deadbeef:1")
+
+    assert backlog is None
+
+
+def test_future_seq_requires_reset():
+    hub = ImageEventHub()
+    hub.publish({"id": "a"})
+
+    _, backlog = hub.subscribe(f"{hub.epoch}:5")
+
+    assert backlog is None
+
+
+def test_malformed_last_event_id_requires_reset():
+    hub = ImageEventHub()
+
+    _, backlog = hub.subscribe(f"{hub.epoch}:abc")
+
+    assert backlog is None
+
+
+def test_image_event_payload_omits_base64():
+    payload = image_event_payload({
+        "id": "a",
+        "prompt": "p",
+        "style": "lifestyle",
+        "image_base64": "AAAA",
+        "created_at": "2025-01-01T00:00:00+00:00",
+    })
+
+    assert "image_base64" not in payload
+    assert payload["id"] == "a"
+
+
+def test_stream_opening_frame_carries_current_id(monkeypatch):
+    hub = ImageEventHub()
+    hub.publish({"id": "a"})
+    monkeypatch.setattr(server, "image_events", hub)
+
+    (opening,) = read_sse(1)
+
+    assert opening["id"] == hub.last_event_id
+    assert opening["retry"] == str(server.SSE_RETRY_MS)
+    assert not hub._subscribers
+
+
+def test_stream_reconnect_with_opening_id_replays_gap(monkeypatch):
+    hub = ImageEventHub()
+    monkeypatch.setattr(server, "image_events", hub)
+    (opening,) = read_sse(1)
+
+    # Imagens publicadas enquanto o cliente estava desconectado
+    hub.publish({"id": "a"})
+    hub.publish({"id": "b"})
+    _, first, second = read_sse(3, last_event_id=opening["id"])
+
+    assert [first["event"], second["event"]] == ["image", "image"]
+    assert [first["id"], second["id"]] == [f"{hub.epoch}:1", f"{hub.epoch}:2"]
+    assert '"id": "b"' in second["data"]
+
+
+def test_stream_unknown_last_event_id_sends_reset(monkeypatch):
+    hub = ImageEventHub()
+    hub.publish({"id": "a"})
+    monkeypatch.setattr(server, "image_events", hub)
+
+    opening, reset = read_sse(2, last_event_id="deadbeef:1")
+
+    assert opening["id"] == hub.last_event_id
+    assert reset["event"] == "reset"
+    assert reset["id"] == hub.last_event_id
+
+
+def test_watcher_falls_back_when_change_streams_unsupported(monkeypatch):
+    hub, images = run_watcher(monkeypatch, ([], UNSUPPORTED))
+
+    assert len(images.calls) == 1
+    assert hub.change_stream_active is False
+
+
+def test_watcher_resumes_after_transient_error_without_fallback(monkeypatch):
+    hub, images = run_watcher(
+        monkeypatch,
+        ([insert("a")], AutoReconnect("connection reset")),
+        ([insert("b")], UNSUPPORTED),
+    )
+
+    assert images.calls[1] == {"resume_after": {"_data": "a"}, "active": True}
+    assert [event[1] for event in hub._history] == [1, 2]
+    assert hub.change_stream_active is False
+
+
+def test_watcher_history_lost_starts_new_epoch(monkeypatch):
+    hub = ImageEventHub()
+    queue, _ = hub.subscribe()
+    images = FakeImagesCollection(
+        hub,
+        ([insert("a")], OperationFailure("history lost", code=286)),
+        ([], UNSUPPORTED),
+    )
+    old_epoch = hub.epoch
+    monkeypatch.setattr(server, "image_events", hub)
+    monkeypatch.setattr(server, "db", SimpleNamespace(product_images=images))
+    monkeypatch.setattr(server, "CHANGE_STREAM_RETRY_SECONDS", 0)
+
+    asyncio.run(asyncio.wait_for(server.watch_product_images(), timeout=5))
+
+    assert images.calls[1] == {"resume_after": None, "active": False}
+    assert hub.epoch != old_epoch
+    # Stream aberto é encerrado e o id antigo passa a exigir reset
+    assert drain(queue)[-1] is None
+    assert hub.subscribe(f"{old_epoch}:1")[1] is None
+
+
+def test_watcher_unexpected_error_clears_active_flag(monkeypatch):
+    hub, images = run_watcher(monkeypatch, ([insert("a")], ValueError("bad bson")))
+
+    assert len(images.calls) == 1
+    assert hub.change_stream_active is False
+
+
+def test_stream_closes_when_client_stops_reading(monkeypatch):
+    hub = ImageEventHub()
+    monkeypatch.setattr(server, "image_events", hub)
+    monkeypatch.setattr(server, "SSE_SEND_TIMEOUT_SECONDS", 0.1)
+
+    async def run():
+        AppStatus.should_exit_event = None
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            # Cliente travado: a escrita do corpo nunca completa
+            if message["type"] == "http.response.body":
+                await asyncio.Event().wait()
+
+        await asyncio.wait_for(server.app(events_scope(), receive, send), timeout=5)
+
+    with pytest.raises(Exception) as excinfo:
+        asyncio.run(run())
+
+    errors = getattr(excinfo.value, "exceptions", (excinfo.value,))
+    assert any(isinstance(error, SendTimeoutError) for error in errors)
+    assert not hub._subscribers
+
+
+def run_generate(monkeypatch, hub):
+    class FakeImageGeneration:
+        def __init__(self, api_key):
+            pass
+
+        async def generate_images(self, prompt, model, number_of_images):
+            return [b"png"]
+
+    inserted = []
+
+    async def insert_one(doc):
+        inserted.append(doc)
+
+    generation = ModuleType("emergentintegrations.llm.openai.image_generation")
+    generation.OpenAIImageGeneration = FakeImageGeneration
+    for name in ("emergentintegrations", "emergentintegrations.llm", "emergentintegrations.llm.openai"):
+        monkeypatch.setitem(sys.modules, name, ModuleType(name))
+    monkeypatch.setitem(sys.modules, generation.__name__, generation)
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+    monkeypatch.setattr(server, "image_events", hub)
+    monkeypatch.setattr(server, "db", SimpleNamespace(product_images=SimpleNamespace(insert_one=insert_one)))
+
+    request = server.ImageGenerationRequest(prompt="teste", style="custom")
+    response = asyncio.run(server.generate_product_image(request))
+    return response, inserted
+
+
+def test_generate_publishes_directly_without_change_stream(monkeypatch):
+    hub = ImageEventHub()
+    queue, _ = hub.subscribe()
+
+    response, inserted = run_generate(monkeypatch, hub)
+
+    (event,) = drain(queue)
+    assert response["id"] == inserted[0]["id"]
+    assert f'"id": "{response["id"]}"' in event[2]
+    assert "image_base64" not in event[2]
+
+
+def test_generate_leaves_publishing_to_active_change_stream(monkeypatch):
+    hub = ImageEventHub()
+    hub.change_stream_active = True
+    queue, _ = hub.subscribe()
+
+    response, inserted = run_generate(monkeypatch, hub)
+
+    assert response["id"] == inserted[0]["id"]
+    assert queue.empty()